@@ -14,6 +14,10 @@ JOIN locations rl ON ul.location_id = rl.urban_pair_id
 JOIN temperature_data r ON r.location_id = rl.location_id AND r.timestamp = u.timestamp
 WHERE ul.is_urban = TRUE;
 
+-- Unique indexes allow REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_urban_rural_hourly_unique
+ON urban_rural_hourly(urban_id, timestamp);
+
 -- Daily aggregation view
 CREATE MATERIALIZED VIEW IF NOT EXISTS urban_rural_daily AS
 SELECT 
@@ -28,6 +32,9 @@ FROM urban_rural_hourly
 GROUP BY date_trunc('day', timestamp), urban_location
 ORDER BY date_trunc('day', timestamp), urban_location;
 
+CREATE UNIQUE INDEX IF NOT EXISTS idx_urban_rural_daily_unique
+ON urban_rural_daily(urban_location, date);
+
 -- The view that is used for the dashboard
 CREATE MATERIALIZED VIEW IF NOT EXISTS normalized_differential_daily AS
 WITH rural_daily AS (
@@ -72,4 +79,7 @@ SELECT
     d.avg_temp_diff / NULLIF(rs.rolling_std, 0) AS normalized_differential
 FROM daily_diff_from_hourly d
 JOIN rural_stats rs ON d.urban_id = rs.urban_pair_id AND d.date = rs.date
-ORDER BY d.date, d.urban_location;
\ No newline at end of file
+ORDER BY d.date, d.urban_location;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_normalized_differential_daily_unique
+ON normalized_differential_daily(urban_location, date);
\ No newline at end of file
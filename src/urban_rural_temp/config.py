@@ -4,15 +4,28 @@ Configuration module to store constants and configurational functions
 
 import os
 import logging
+import functools
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
+@functools.lru_cache(maxsize=None)
+def _env(key, default=None):
+    """Read an environment variable once, they do not change while running"""
+    return os.environ.get(key, default)
+
 # Configure logging
+_logging_configured = False
+
 def setup_logging(log_file=None):
-    """Set up logging configuration"""
+    """Set up logging configuration, only the first call has an effect"""
+    global _logging_configured
+    if _logging_configured:
+        return logging.getLogger(__name__)
+    _logging_configured = True
+    
     log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    log_level = os.environ.get('LOG_LEVEL', 'INFO')
+    log_level = _env('LOG_LEVEL', 'INFO')
     
     handlers = [logging.StreamHandler()]
     if log_file:
@@ -42,24 +55,30 @@ def get_db_config(env=None):
 
     # Determine environment if not provided
     if env is None:
-        env = os.environ.get('DB_ENV', 'dev').lower()
+        env = _env('DB_ENV', 'dev').lower()
     
+    # Copy so callers can override parameters without touching the cache
+    return dict(_build_db_config(env))
+
+@functools.lru_cache(maxsize=None)
+def _build_db_config(env):
+    """Build database configuration once per environment"""
     
     # Base configuration for all environments
     config = {
-        'host': os.environ.get('DB_HOST', 'localhost'),
-        'database': os.environ.get('DB_NAME', 'temperature_diff'),
-        'user': os.environ.get('DB_USER', 'postgres'),
-        'password': os.environ.get('DB_PASSWORD', 'postgres'),
-        'port': os.environ.get('DB_PORT', '5432')
+        'host': _env('DB_HOST', 'localhost'),
+        'database': _env('DB_NAME', 'temperature_diff'),
+        'user': _env('DB_USER', 'postgres'),
+        'password': _env('DB_PASSWORD', 'postgres'),
+        'port': _env('DB_PORT', '5432')
     }
     
     if env == 'prod':
         # Production settings - require environment variables to be set
         # to avoid accidental use of default credentials in production
-        if 'DB_HOST' not in os.environ:
+        if _env('DB_HOST') is None:
             raise ValueError("DB_HOST environment variable must be set in production")
-        if 'DB_PASSWORD' not in os.environ or 'DB_USER' not in os.environ:
+        if _env('DB_PASSWORD') is None or _env('DB_USER') is None:
             raise ValueError("DB_PASSWORD and DB_USER environment variables must be set in production")
 
     return config
@@ -73,6 +92,12 @@ class APIConfig:
     # Rate limiting
     MAX_REQUESTS_PER_MINUTE = 10
     REQUEST_TIMEOUT = 30  # seconds
+    CONNECTION_POOL_SIZE = 16  # Kept-alive connections shared by concurrent fetches
+    MAX_LOCATIONS_PER_REQUEST = 10  # Coordinates fetched together in one request
+
+    # On-disk cache of archive responses, disabled unless a directory is set
+    CACHE_DIR = _env('WEATHER_CACHE_DIR')
+    ARCHIVE_DELAY_DAYS = 5  # Recent days the archive may still fill in, never cached
     
     # Add more API settings as needed
 
@@ -85,35 +110,53 @@ class SQLConfig:
     INDEXES_PATH = os.path.join(str(BASE_DIR), "sql", "indexes.sql")
     VIEWS_PATH = os.path.join(str(BASE_DIR), "sql", "views.sql")
 
+# Database load configuration
+class DataConfig:
+    """Database load settings"""
+
+    # Rows sent per INSERT statement by execute_values
+    BULK_PAGE_SIZE = 10000
+
+    # Batches smaller than this are inserted with execute_values instead of COPY
+    COPY_MIN_ROWS = 200
+
+    # Server-side timeouts for pooled connections
+    STATEMENT_TIMEOUT_MS = int(_env('DB_STATEMENT_TIMEOUT_MS', 300000))
+    IDLE_IN_TRANSACTION_TIMEOUT_MS = 60000
+    CONNECT_TIMEOUT = 5  # seconds
+
+
+# Urban-rural location pairs, built once at import
+# Format: (urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon)
+_URBAN_RURAL_PAIRS = (
+    ('Phoenix', 33.427063,-112.02719, 'Buckeye (AZ, USA)', 33.356766,-112.55556),
+    ('Madrid', 40.386642,-3.6760864, 'Cotos de Monterrey (SP)', 40.808434,-3.5795593),
+    ('Melbourne', -37.785587,144.93976, 'Wandin North (AU)', -37.785587,145.42169),
+    ('Seoul', 37.57469,126.96, 'Namyangju (KR)', 37.64499,127.249664),
+    ('Atlanta', 33.778557,-84.51492, 'Powder Springs (GA, USA)', 33.848858,-84.73224),
+    ('Chicago', 41.862915,-87.64877, 'Yorkville (IL, USA)', 41.65202,-88.43933),
+    ('Beijing', 39.89455,116.35983, 'Huairou (CN)', 40.31634,116.58228),
+    ('Cairo', 30.052723,31.190199, 'El Saff (EG)', 29.56063,31.25),
+    ('Mexico City', 19.437609,-99.10715, 'Amecameca (MX)', 19.156414,-98.80435),
+    ('Berlin', 52.54833,13.407822, 'Nauen (DE)', 52.618626,12.929104),
+    ('Denver', 39.753952,-105.02086, 'Elizabeth (CO, USA)', 39.33216,-104.64827),
+    ('Stockholm', 59.297012,18.163265, 'Gustavsberg (SE)', 59.36731,18.40909),
+    ('Montreal', 45.51845,-73.61069, 'La Vallée-du-Richelieu (CA)', 45.51845,-73.18683),
+    ('Portland', 45.51845,-122.63736, 'Beavercreek (OR, USA)', 45.307556,-122.484375),
+    ('Johannesburg', -26.186293,28.026318, 'Magaliesburg (South Africa)', -25.975395,27.540985),
+    ('Milan', 45.448154,9.169279, 'Abbiategrasso (ITA)', 45.377853,8.8732395),
+    ('Delhi', 28.646748,77.17218, 'Manesar (IN)', 28.365553,76.92395),
+    ('Paris', 48.822495,2.2881355, 'Montge-en-Göele (FR)', 49.03339,2.7597957),
+    ('Brisbane', -27.45167,153.02014, 'King Scrub (AU)', -27.170475,152.83965),
+    ('Sariyer', 41.08963,29.057144, 'Catalca (TR)', 41.159927,28.454935),
+)
 
 def get_urban_rural_pairs():
     """
     Define urban-rural location pairs for analysis
     
     Returns:
-        list: List of location pairs, each containing 
-              [urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon]
+        tuple: Immutable location pairs, each containing 
+               (urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon)
     """
-    return [
-        # Format: [urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon]
-        ['Phoenix', 33.427063,-112.02719, 'Buckeye (AZ, USA)', 33.356766,-112.55556],
-        ['Madrid', 40.386642,-3.6760864, 'Cotos de Monterrey (SP)', 40.808434,-3.5795593],
-        ['Melbourne', -37.785587,144.93976, 'Wandin North (AU)', -37.785587,145.42169],
-        ['Seoul', 37.57469,126.96, 'Namyangju (KR)', 37.64499,127.249664],
-        ['Atlanta', 33.778557,-84.51492, 'Powder Springs (GA, USA)', 33.848858,-84.73224],
-        ['Chicago', 41.862915,-87.64877, 'Yorkville (IL, USA)', 41.65202,-88.43933],
-        ['Beijing', 39.89455,116.35983, 'Huairou (CN)', 40.31634,116.58228],
-        ['Cairo', 30.052723,31.190199, 'El Saff (EG)', 29.56063,31.25],
-        ['Mexico City', 19.437609,-99.10715, 'Amecameca (MX)', 19.156414,-98.80435],
-        ['Berlin', 52.54833,13.407822, 'Nauen (DE)', 52.618626,12.929104],
-        ['Denver', 39.753952,-105.02086, 'Elizabeth (CO, USA)', 39.33216,-104.64827],
-        ['Stockholm', 59.297012,18.163265, 'Gustavsberg (SE)', 59.36731,18.40909],
-        ['Montreal', 45.51845,-73.61069, 'La Vallée-du-Richelieu (CA)', 45.51845,-73.18683],
-        ['Portland', 45.51845,-122.63736, 'Beavercreek (OR, USA)', 45.307556,-122.484375],
-        ['Johannesburg', -26.186293,28.026318, 'Magaliesburg (South Africa)', -25.975395,27.540985],
-        ['Milan', 45.448154,9.169279, 'Abbiategrasso (ITA)', 45.377853,8.8732395],
-        ['Delhi', 28.646748,77.17218, 'Manesar (IN)', 28.365553,76.92395],
-        ['Paris', 48.822495,2.2881355, 'Montge-en-Göele (FR)', 49.03339,2.7597957],
-        ['Brisbane', -27.45167,153.02014, 'King Scrub (AU)', -27.170475,152.83965],
-        ['Sariyer', 41.08963,29.057144, 'Catalca (TR)', 41.159927,28.454935],
-    ]
+    return _URBAN_RURAL_PAIRS
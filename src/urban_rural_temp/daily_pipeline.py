@@ -7,32 +7,36 @@ the latest temperature data for urban-rural location pairs.
 """
 
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
-import traceback
 import sys
 import os
 
 # Add the directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import get_urban_rural_pairs
+from config import get_urban_rural_pairs, setup_logging
 from extract import ExtractData
 from load import LoadData
+from utils import prewarm_partitions
 
+logger = logging.getLogger(__name__)
 
 
-def process_location_pair(extract_data, load_data, conn, pair, start_date, end_date):
+def process_location_pair(pair, fetched, location_ids):
     """
-    Process a single urban-rural location pair
+    Collect the fetched data of a single urban-rural location pair
     
     Args:
-        conn: Database connection
         pair: Location pair (urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon)
-        start_date: Start date for data collection
-        end_date: End date for data collection
+        fetched (dict): Location name mapped to its DataFrame or fetch exception
+        location_ids (dict): Location name mapped to its database ID
         
     Returns:
-        dict: Statistics about processed records
+        tuple: Statistics of the pair and a list of (records key, DataFrame)
+               tuples, the DataFrames tagged with a location_id column and
+               ready for loading. The record counts are set once loaded
     """
     urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon = pair
     stats = {
@@ -42,37 +46,59 @@ def process_location_pair(extract_data, load_data, conn, pair, start_date, end_d
         'rural_records': 0,
         'status': 'pending'
     }
+    frames = []
     
     try:
-        # Fetch urban data
-        print(f"Fetching data for {urban_name}")
-        urban_df = extract_data.fetch_historical_weather(urban_lat, urban_lon, start_date, end_date)
+        # Re-raise any error from the fetch phase
+        for name in (urban_name, rural_name):
+            if isinstance(fetched[name], Exception):
+                raise fetched[name]
         
-        # Fetch rural data
-        print(f"Fetching data for {rural_name}")
-        rural_df = extract_data.fetch_historical_weather(rural_lat, rural_lon, start_date, end_date)
+        urban_df = fetched[urban_name]
+        rural_df = fetched[rural_name]
         
-        # Load location data to get IDs
-        locations = load_data.load_locations(conn, [pair])
-        urban_id = locations[urban_name]
-        rural_id = locations[rural_name]
-        
-        # Load temperature data
-        stats['urban_records'] = load_data.load_temperature_data(conn, urban_id, urban_df)
-        stats['rural_records'] = load_data.load_temperature_data(conn, rural_id, rural_df)
+        # Tag temperature data with location IDs, loaded after all pairs.
+        # Tagged in place so the fetched frames are not copied
+        for key, name, df in (('urban_records', urban_name, urban_df), ('rural_records', rural_name, rural_df)):
+            if not df.empty:
+                df['location_id'] = location_ids[name]
+                frames.append((key, df))
         
+        # A pair without data on both sides has no differential to report
+        if urban_df.empty or rural_df.empty:
+            stats['status'] = 'empty'
+            logger.warning("No data for %s-%s pair: %d urban and %d rural records",
+                           urban_name, rural_name, len(urban_df), len(rural_df))
+            return stats, frames
         
         stats['status'] = 'success'
-        print(f"Successfully processed {urban_name}-{rural_name} pair: " +
-                   f"{stats['urban_records']} urban and {stats['rural_records']} rural records")
+        logger.info("Successfully fetched %s-%s pair: %d urban and %d rural records",
+                    urban_name, rural_name, len(urban_df), len(rural_df))
         
     except Exception as e:
         stats['status'] = 'error'
         stats['error'] = str(e)
-        print(f"Error processing {urban_name}-{rural_name} pair: {e}")
-        print(traceback.format_exc())
+        logger.error("Error processing %s-%s pair: %s", urban_name, rural_name, e, exc_info=True)
     
-    return stats
+    return stats, frames
+
+def ingest_location(load_data, env, temp_df):
+    """
+    Load the temperature data of a single location on its own pooled connection
+    
+    Args:
+        load_data: LoadData instance
+        env (str): Environment ('dev', 'test', 'prod')
+        temp_df (pandas.DataFrame): DataFrame tagged with a location_id column
+        
+    Returns:
+        int: Number of records inserted
+    """
+    conn = load_data.get_connection_from_pool(env)
+    try:
+        return load_data.load_temperature_frame(conn, temp_df)
+    finally:
+        load_data.return_connection_to_pool(conn)
 
 def run_daily_pipeline(extract_data, load_data, date=None, days_back=3, env=None):
     """
@@ -99,7 +125,7 @@ def run_daily_pipeline(extract_data, load_data, date=None, days_back=3, env=None
         end_date = date
         start_date = end_date - timedelta(days=days_back-1)
     
-    print(f"Starting daily pipeline for date range: {start_date} to {end_date}")
+    logger.info("Starting daily pipeline for date range: %s to %s", start_date, end_date)
     
     # Initialize stats
     stats = {
@@ -111,48 +137,92 @@ def run_daily_pipeline(extract_data, load_data, date=None, days_back=3, env=None
         'location_pairs': [],
         'total_records': 0,
         'success_count': 0,
+        'empty_count': 0,
         'error_count': 0,
         'status': 'running'
     }
     
     # Get location pairs
     location_pairs = get_urban_rural_pairs()
-    print(f"Processing {len(location_pairs)} location pairs")
+    logger.info("Processing %d location pairs", len(location_pairs))
     
     conn = None
     try:
         # Get database connection
         conn = load_data.get_db_connection(env)
         
-        # Process each location pair
+        # Make sure the partitions new data goes to exist before loading
+        prewarm_partitions(conn)
+        
+        # Load all locations once to get their IDs
+        location_ids = load_data.load_locations(conn, location_pairs)
+        
+        # Fetch all locations concurrently
+        fetched = extract_data.fetch_locations(location_pairs, start_date, end_date)
+        
+        # Collect each location pair, as (pair statistics, records key, DataFrame)
+        loads = []
         for pair in location_pairs:
-            pair_stats = process_location_pair(extract_data, load_data, conn, pair, start_date, end_date)
+            pair_stats, pair_frames = process_location_pair(pair, fetched, location_ids)
             stats['location_pairs'].append(pair_stats)
+            loads.extend((pair_stats, key, df) for key, df in pair_frames)
+        
+        # Load all fetched temperature data
+        if loads:
+            # Create partitions once, before the concurrent loads need them
+            load_data.ensure_partitions(
+                conn,
+                min(df['timestamp'].min() for _, _, df in loads),
+                max(df['timestamp'].max() for _, _, df in loads)
+            )
             
-            # Update totals
+            # Load each location on its own pooled connection, as many at once as the
+            # pool has free. A failed load only fails its own pair, the other loads are
+            # committed anyway
+            max_workers = max(1, load_data.available_connections(env))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(ingest_location, load_data, env, df): (pair_stats, key)
+                    for pair_stats, key, df in loads
+                }
+                for future in as_completed(futures):
+                    pair_stats, key = futures[future]
+                    try:
+                        count = future.result()
+                    except Exception as e:
+                        pair_stats['status'] = 'error'
+                        pair_stats['error'] = str(e)
+                        logger.error("Error loading %s for %s-%s pair: %s", key.split('_')[0],
+                                     pair_stats['urban_name'], pair_stats['rural_name'], e, exc_info=True)
+                        continue
+                    pair_stats[key] = count
+                    stats['total_records'] += count
+        
+        # Update totals, once loading has settled the status of each pair
+        for pair_stats in stats['location_pairs']:
             if pair_stats['status'] == 'success':
                 stats['success_count'] += 1
-                stats['total_records'] += pair_stats['urban_records'] + pair_stats['rural_records']
+            elif pair_stats['status'] == 'empty':
+                stats['empty_count'] += 1
             else:
                 stats['error_count'] += 1
         
         # Refresh materialized views to include new data
         if stats['total_records'] > 0:
-            print("Refreshing materialized views")
-            load_data.refresh_materialized_views(conn)
+            logger.info("Refreshing materialized views")
+            load_data.refresh_materialized_views_parallel(env)
         
         # Final status
         stats['status'] = 'error' if stats['error_count'] > 0 else 'success'
         
     except Exception as e:
-        print(f"Pipeline error: {e}")
-        print(traceback.format_exc())
+        logger.error("Pipeline error: %s", e, exc_info=True)
         stats['status'] = 'error'
         stats['error'] = str(e)
     finally:
         if conn:
-            conn.close()
-            print("Database connection closed")
+            load_data.return_connection_to_pool(conn)
+            logger.info("Database connection returned to the pool")
     
     # Calculate duration
     pipeline_end = datetime.now()
@@ -160,15 +230,16 @@ def run_daily_pipeline(extract_data, load_data, date=None, days_back=3, env=None
     stats['end_time'] = pipeline_end.isoformat()
     stats['duration_seconds'] = duration.total_seconds()
     
-    print(f"Pipeline completed with status: {stats['status']}")
-    print(f"Processed {stats['total_records']} records in {duration.total_seconds():.2f} seconds")
+    logger.info("Pipeline completed with status: %s", stats['status'])
+    logger.info("Processed %d records in %.2f seconds", stats['total_records'], duration.total_seconds())
     
     return stats
 
 
 if __name__ == "__main__":
     # For local execution
-    print("Starting daily pipeline local execution")
+    setup_logging()
+    logger.info("Starting daily pipeline local execution")
     extract_data = ExtractData()
     load_data = LoadData()
     stats = run_daily_pipeline(extract_data, load_data, days_back=3)
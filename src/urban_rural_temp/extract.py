@@ -1,134 +1,400 @@
+import orjson
 import requests
-import pandas as pd
-from datetime import datetime
+from datetime import date, timedelta
+import hashlib
+import logging
+import os
 import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from config import APIConfig
 
+logger = logging.getLogger(__name__)
+
 
 class ExtractData:
     """
     Data extraction class
     """
-    def __init__(self, max_retries=3, backoff_factor=0.5, max_rate_per_min=APIConfig.MAX_REQUESTS_PER_MINUTE):
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_rate_per_min=APIConfig.MAX_REQUESTS_PER_MINUTE,
+                 cache_dir=APIConfig.CACHE_DIR):
         self.max_retries=max_retries
         self.backoff_factor=backoff_factor
         self.max_rate_per_min=max_rate_per_min
+        self.cache_dir = Path(cache_dir) if cache_dir else None  # None disables the response cache
+        self.request_times = deque()  # Start times of requests in the last minute
+        self.rate_lock = threading.Lock()  # Shared by concurrent fetches
+        self._base_params = {"hourly": "temperature_2m", "timezone": "UTC"}  # Same for every request
+        self.session = self.create_session()
 
-    def fetch_with_retry(self, url, params):
+    def create_session(self):
         """
-        Fetch data with retry logic and rate limiting
+        Create the HTTP session shared by all requests of this instance
+        
+        Reusing one session keeps connections to the API alive between
+        requests, instead of a new TCP and TLS handshake for every fetch.
         
-        Args:
-            url (str): API URL
-            params (dict): Query parameters
-            max_retries (int): Maximum number of retries
-            backoff_factor (float): Backoff factor for retries
-            max_rate_per_min (int): Maximum requests per minute
-            
         Returns:
-            dict: API response JSON
+            requests.Session: Session with retry logic and compression enabled
         """
-        # Add simple delay for rate limiting if needed
-        time.sleep(60 / self.max_rate_per_min)  # Simple rate limiting
-        
-        # Set up session with retry logic
         session = requests.Session()
+        session.headers.update({"Accept-Encoding": "gzip, deflate"})
+        
         retry_strategy = Retry(
             total=self.max_retries,
             backoff_factor=self.backoff_factor,
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["GET"]
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=APIConfig.CONNECTION_POOL_SIZE,
+            pool_maxsize=APIConfig.CONNECTION_POOL_SIZE
+        )
         session.mount("https://", adapter)
         
+        return session
+
+    def wait_for_rate_limit(self):
+        """
+        Block until another request fits in the one-minute rate limit window
+        
+        Safe to call from multiple threads, requests are only delayed once
+        max_rate_per_min requests have been started within the last minute.
+        """
+        with self.rate_lock:
+            while True:
+                now = time.monotonic()
+                while self.request_times and now - self.request_times[0] >= 60:
+                    self.request_times.popleft()
+                
+                if len(self.request_times) < self.max_rate_per_min:
+                    self.request_times.append(now)
+                    return
+                
+                time.sleep(60 - (now - self.request_times[0]))
+
+    def cache_path(self, url, params):
+        """
+        Get the cache file of a request, named after a hash of its full URL
+        
+        Args:
+            url (str): API URL
+            params (dict): Query parameters
+            
+        Returns:
+            pathlib.Path: Cache file path, or None if caching is disabled
+        """
+        if self.cache_dir is None:
+            return None
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        return self.cache_dir / f"{hashlib.sha256(full_url.encode()).hexdigest()}.json"
+
+    def read_cache(self, path):
+        """
+        Read a cached response body
+        
+        Only settled archive windows are cached, so entries never expire.
+        
+        Args:
+            path (pathlib.Path): Cache file path
+            
+        Returns:
+            bytes: Cached response body, or None if not cached
+        """
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def write_cache(self, path, body):
+        """
+        Store a response body, written to a temporary file first so that
+        concurrent readers never see a partial file
+        
+        Args:
+            path (pathlib.Path): Cache file path
+            body (bytes): Response body
+        """
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write response cache %s: %s", path, e)
+
+    def fetch_with_retry(self, url, params, use_cache=False):
+        """
+        Fetch data with retry logic and rate limiting
+        
+        Args:
+            url (str): API URL
+            params (dict): Query parameters
+            use_cache (bool): Serve and store the response in the on-disk
+                              cache, only for responses that do not change
+            
+        Returns:
+            dict: API response JSON
+        """
+        path = self.cache_path(url, params) if use_cache else None
+        if path is not None:
+            body = self.read_cache(path)
+            if body is not None:
+                return orjson.loads(body)
+        
+        # Rate limiting shared across threads
+        self.wait_for_rate_limit()
+        
         try:
-            response = session.get(url, params=params, timeout=APIConfig.REQUEST_TIMEOUT)
+            response = self.session.get(url, params=params, timeout=APIConfig.REQUEST_TIMEOUT)
             response.raise_for_status()
-            return response.json()
+            # orjson decodes the long hourly arrays much faster than the stdlib
+            data = orjson.loads(response.content)
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching data after {self.max_retries} retries: {e}")
+            logger.error("Error fetching data after %d retries: %s", self.max_retries, e)
             raise
+        
+        if path is not None:
+            self.write_cache(path, response.content)
+        return data
 
-    def fetch_historical_weather(self, latitude, longitude, start_date, end_date):
+    def build_params(self, latitude, longitude, start_date, end_date):
         """
-        Fetch historical weather data from Open-Meteo API
+        Build the query parameters of an archive API request
         
         Args:
-            latitude (float): Location latitude
-            longitude (float): Location longitude
-            start_date (str or datetime): Start date in format 'YYYY-MM-DD'
-            end_date (str or datetime): End date in format 'YYYY-MM-DD'
+            latitude (float or str): Location latitude, or comma-separated latitudes
+            longitude (float or str): Location longitude, or comma-separated longitudes
+            start_date (str or date): Start date in format 'YYYY-MM-DD'
+            end_date (str or date): End date in format 'YYYY-MM-DD'
             
         Returns:
-            pandas.DataFrame: Weather data with columns for timestamp and temperature
+            dict: Query parameters
         """
-        # Convert datetime objects to strings if needed
-        if isinstance(start_date, datetime):
+        # Convert date and datetime objects to strings if needed
+        if isinstance(start_date, date):
             start_date = start_date.strftime('%Y-%m-%d')
-        if isinstance(end_date, datetime):
+        if isinstance(end_date, date):
             end_date = end_date.strftime('%Y-%m-%d')
         
-        
-        print(f"Fetching weather data for coordinates ({latitude}, {longitude}) "
-                    f"from {start_date} to {end_date}")
-        
-        url = APIConfig.WEATHER_API_URL
-        params = {
+        return {
+            **self._base_params,
             "latitude": latitude,
             "longitude": longitude,
             "start_date": start_date,  # Use actual input parameters
             "end_date": end_date,      # Use actual input parameters
-            "hourly": "temperature_2m",
-            "timezone": "UTC"
         }
-        
-        try:
-            data = self.fetch_with_retry(url, params)
 
-            # Check if the response contains the expected data
-            if "hourly" not in data:
-                print(f"Unexpected API response format. Missing 'hourly' key. Response: {data}")
-                raise ValueError("Unexpected API response format")
-                
-            required_fields = ["time", "temperature_2m"]
-            for field in required_fields:
-                if field not in data["hourly"]:
-                    print(f"Missing required field '{field}' in API response")
-                    raise ValueError(f"Missing required field '{field}' in API response")
-                
-            # Convert to DataFrame
-            df = pd.DataFrame({
-                "timestamp": pd.to_datetime(data["hourly"]["time"]),
-                "temperature": data["hourly"]["temperature_2m"],
-            })
-            
-            # Drop rows with NaN values
-            df_clean = df.dropna()
+    def is_cacheable(self, params):
+        """
+        Check whether the response of a request can be served from the cache
+        
+        Args:
+            params (dict): Query parameters from build_params
             
-            dropped_count = len(df) - len(df_clean)
+        Returns:
+            bool: True if the requested window no longer changes
+        """
+        # The archive fills in recent days with a delay, older data does not change anymore
+        settled_until = date.today() - timedelta(days=APIConfig.ARCHIVE_DELAY_DAYS)
+        return date.fromisoformat(params["end_date"]) < settled_until
+
+    def parse_weather_data(self, data, latitude, longitude):
+        """
+        Convert the API response of a single location to a DataFrame
+        
+        Args:
+            data (dict): API response JSON for one location
+            latitude (float): Location latitude
+            longitude (float): Location longitude
             
-            if dropped_count > 0:
-                missing_percentage = (dropped_count / len(df)) * 100
-                print(f"Dropped {dropped_count} rows with NaN values ({missing_percentage:.1f}%)")
-                if missing_percentage > 20:
-                    print(f"High percentage of missing values ({missing_percentage:.1f}%) for coordinates ({latitude}, {longitude})")
+        Returns:
+            pandas.DataFrame: Weather data with columns for timestamp and temperature,
+                              empty if the location reported no values
+        """
+        # Check if the response contains the expected data
+        if "hourly" not in data:
+            logger.error("Unexpected API response format. Missing 'hourly' key. Response: %s", data)
+            raise ValueError("Unexpected API response format")
             
-            if len(df_clean) == 0:
-                print("No valid data points returned from API")
-                raise ValueError("No valid data returned from the weather API")
+        required_fields = ["time", "temperature_2m"]
+        for field in required_fields:
+            if field not in data["hourly"]:
+                logger.error("Missing required field '%s' in API response", field)
+                raise ValueError(f"Missing required field '{field}' in API response")
             
-            print(f"Successfully fetched {len(df_clean)} records")
+        # Convert to typed arrays, the libraries are imported on first use only
+        import numpy as np
+        import pandas as pd
+        timestamps = np.asarray(data["hourly"]["time"], dtype="datetime64[s]")
+        # float32 is ample for 0.1 °C readings; null -> NaN
+        temperatures = np.asarray(data["hourly"]["temperature_2m"], dtype=np.float32)
+        
+        # Filter rows with NaN values before building the DataFrame,
+        # clean responses are used as they are without copying
+        nan_mask = np.isnan(temperatures)
+        if nan_mask.any():
+            timestamps = timestamps[~nan_mask]
+            temperatures = temperatures[~nan_mask]
+        df_clean = pd.DataFrame({
+            "timestamp": timestamps,
+            "temperature": temperatures,
+        })
+        
+        dropped_count = int(nan_mask.sum())
+        
+        if dropped_count > 0:
+            missing_percentage = (dropped_count / len(nan_mask)) * 100
+            logger.debug("Dropped %d rows with NaN values (%.1f%%)", dropped_count, missing_percentage)
+            if missing_percentage > 20:
+                logger.warning("High percentage of missing values (%.1f%%) for coordinates (%s, %s)",
+                               missing_percentage, latitude, longitude)
+        
+        # A location without any readings, e.g. an offline station, is
+        # returned empty to be reported as such, not as an error
+        if len(df_clean) == 0:
+            logger.warning("No valid data points returned from API for coordinates (%s, %s)",
+                           latitude, longitude)
             return df_clean
+        
+        logger.debug("Successfully fetched %d records", len(df_clean))
+        return df_clean
+
+    def fetch_historical_weather(self, latitude, longitude, start_date, end_date):
+        """
+        Fetch historical weather data from Open-Meteo API
+        
+        Args:
+            latitude (float): Location latitude
+            longitude (float): Location longitude
+            start_date (str or date): Start date in format 'YYYY-MM-DD'
+            end_date (str or date): End date in format 'YYYY-MM-DD'
+            
+        Returns:
+            pandas.DataFrame: Weather data with columns for timestamp and temperature
+        """
+        params = self.build_params(latitude, longitude, start_date, end_date)
+        logger.debug("Fetching weather data for coordinates (%s, %s) from %s to %s",
+                     latitude, longitude, params["start_date"], params["end_date"])
+        
+        # Only consult the archive check when caching is enabled at all
+        use_cache = self.cache_dir is not None and self.is_cacheable(params)
+        
+        try:
+            data = self.fetch_with_retry(APIConfig.WEATHER_API_URL, params, use_cache=use_cache)
+            return self.parse_weather_data(data, latitude, longitude)
             
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching data from Open-Meteo: {e}")
+            logger.error("Error fetching data from Open-Meteo: %s", e)
             raise
         except (KeyError, ValueError) as e:
-            print(f"Error processing API response: {e}")
+            logger.error("Error processing API response: %s", e)
             raise
         except Exception as e:
-            print(f"Unexpected error in fetch_historical_weather: {e}")
-            raise
\ No newline at end of file
+            logger.error("Unexpected error in fetch_historical_weather: %s", e)
+            raise
+
+    def fetch_historical_weather_batch(self, coordinates, start_date, end_date):
+        """
+        Fetch historical weather data of several locations in a single API request
+        
+        Args:
+            coordinates (list): (latitude, longitude) tuples
+            start_date (str or date): Start date in format 'YYYY-MM-DD'
+            end_date (str or date): End date in format 'YYYY-MM-DD'
+            
+        Returns:
+            list: DataFrame for each coordinate in request order, or the
+                  exception raised while processing its part of the response
+        """
+        params = self.build_params(
+            ",".join(str(lat) for lat, _ in coordinates),
+            ",".join(str(lon) for _, lon in coordinates),
+            start_date,
+            end_date
+        )
+        logger.debug("Fetching weather data for %d coordinates from %s to %s",
+                     len(coordinates), params["start_date"], params["end_date"])
+        
+        # Only consult the archive check when caching is enabled at all
+        use_cache = self.cache_dir is not None and self.is_cacheable(params)
+        
+        try:
+            data = self.fetch_with_retry(APIConfig.WEATHER_API_URL, params, use_cache=use_cache)
+        except requests.exceptions.RequestException as e:
+            logger.error("Error fetching data from Open-Meteo: %s", e)
+            raise
+        
+        # A single location is returned as an object, several as a list in request order
+        if isinstance(data, dict):
+            data = [data]
+        if len(data) != len(coordinates):
+            raise ValueError(f"Expected {len(coordinates)} locations in API response, got {len(data)}")
+        
+        results = []
+        for (latitude, longitude), location_data in zip(coordinates, data):
+            try:
+                results.append(self.parse_weather_data(location_data, latitude, longitude))
+            except (KeyError, ValueError) as e:
+                logger.error("Error processing API response for (%s, %s): %s", latitude, longitude, e)
+                results.append(e)
+        
+        return results
+
+    def fetch_locations(self, location_pairs, start_date, end_date):
+        """
+        Fetch weather data for every location of the given pairs in concurrent batches
+        
+        Args:
+            location_pairs (list): Urban-rural location pairs
+            start_date: Start date for data collection
+            end_date: End date for data collection
+            
+        Returns:
+            dict: Location name mapped to its DataFrame, or to the exception
+                  raised while fetching it
+        """
+        # Fetch each distinct coordinate once, even if several locations share it
+        names_by_coords = {}
+        for pair in location_pairs:
+            for name, lat, lon in (pair[0:3], pair[3:6]):
+                names = names_by_coords.setdefault((lat, lon), [])
+                if name not in names:
+                    names.append(name)
+        coordinates = list(names_by_coords)
+        batch_size = APIConfig.MAX_LOCATIONS_PER_REQUEST
+        batches = [coordinates[i:i + batch_size] for i in range(0, len(coordinates), batch_size)]
+        results = {}
+        
+        # Each batch of coordinates is fetched in one request, batches run concurrently
+        with ThreadPoolExecutor(max_workers=APIConfig.MAX_REQUESTS_PER_MINUTE) as executor:
+            futures = {
+                executor.submit(self.fetch_historical_weather_batch, batch, start_date, end_date): batch
+                for batch in batches
+            }
+            
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    batch_results = future.result()
+                except Exception as e:
+                    batch_results = [e] * len(batch)
+                
+                for coords, result in zip(batch, batch_results):
+                    names = names_by_coords[coords]
+                    if isinstance(result, Exception):
+                        for name in names:
+                            results[name] = result
+                        logger.warning("Error fetching data for %s: %s", ", ".join(names), result)
+                        continue
+                    # Frames are tagged in place later, so each extra name gets its own copy
+                    for i, name in enumerate(names):
+                        results[name] = result if i == 0 else result.copy()
+                    logger.debug("Fetched data for %s", ", ".join(names))
+        
+        return results
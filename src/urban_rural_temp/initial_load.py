@@ -1,6 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+import pandas as pd
 from extract import ExtractData
-from config import get_urban_rural_pairs
+from config import get_urban_rural_pairs, setup_logging
 from load import LoadData
 import os
 
@@ -17,6 +19,30 @@ class InitialLoad:
             self.end_date = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
         self.load_data = LoadData()
         self.extract_data = ExtractData()
+
+    def load_pair(self, urban_df, rural_df):
+        """
+        Load the temperature data of one location pair on its own pooled connection
+        
+        Both locations are sent in a single COPY and committed together,
+        a pair is loaded completely or not at all.
+        
+        Args:
+            urban_df (pandas.DataFrame): Urban data tagged with a location_id column
+            rural_df (pandas.DataFrame): Rural data tagged with a location_id column
+            
+        Returns:
+            tuple: Number of urban and rural records inserted
+        """
+        pair_df = pd.concat([urban_df, rural_df], ignore_index=True)
+        
+        conn = self.load_data.get_connection_from_pool()
+        try:
+            self.load_data.load_temperature_frame(conn, pair_df)
+            return len(urban_df), len(rural_df)
+        finally:
+            self.load_data.return_connection_to_pool(conn)
+
     def load_historical_data(self):
         """
         Load initial historical data
@@ -27,35 +53,53 @@ class InitialLoad:
             # Get location pairs
             location_pairs = get_urban_rural_pairs()
             
-            # Load locations
+            # Fetch all locations concurrently
+            print(f"Fetching data for {len(location_pairs)} location pairs")
+            fetched = self.extract_data.fetch_locations(location_pairs, self.start_date, self.end_date)
+
+            # Stop on the first location that could not be fetched
+            for df in fetched.values():
+                if isinstance(df, Exception):
+                    raise df
+
+            # Create partitions for the whole fetched range once, locations
+            # without readings come back empty and have no range
+            frames = [df for df in fetched.values() if not df.empty]
+            if frames:
+                self.load_data.ensure_partitions(
+                    conn,
+                    min(df['timestamp'].min() for df in frames),
+                    max(df['timestamp'].max() for df in frames)
+                )
+            
+            # Load locations, committed so that the pooled connections see them
             location_ids = self.load_data.load_locations(conn, location_pairs)
 
-            # Process each location pair
+            # Load the pairs in parallel, each on its own pooled connection,
+            # as many at once as the pool has free
             total_records = 0
-            for pair in location_pairs:
-                urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon = pair
-                
-                print(f"Processing {urban_name}-{rural_name} pair...")
-                
-                # Fetch urban data
-                print(f"Fetching data for {urban_name}")
-                urban_df = self.extract_data.fetch_historical_weather(urban_lat, urban_lon, self.start_date, self.end_date)
-                
-                # Fetch rural data
-                print(f"Fetching data for {rural_name}")
-                rural_df = self.extract_data.fetch_historical_weather(rural_lat, rural_lon, self.start_date, self.end_date)
-                
-                # Load temperature data
-                urban_id = location_ids[urban_name]
-                rural_id = location_ids[rural_name]
-                
-                urban_count = self.load_data.load_temperature_data(conn, urban_id, urban_df)
-                rural_count = self.load_data.load_temperature_data(conn, rural_id, rural_df)
-                
-                print(f"Loaded {urban_count} records for {urban_name}")
-                print(f"Loaded {rural_count} records for {rural_name}")
+            max_workers = max(1, self.load_data.available_connections())
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {}
+                for pair in location_pairs:
+                    urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon = pair
+                    
+                    # Tag temperature data with location IDs
+                    urban_df = fetched[urban_name]
+                    rural_df = fetched[rural_name]
+                    urban_df['location_id'] = location_ids[urban_name]
+                    rural_df['location_id'] = location_ids[rural_name]
+                    
+                    futures[executor.submit(self.load_pair, urban_df, rural_df)] = pair
                 
-                total_records += urban_count + rural_count
+                for future in as_completed(futures):
+                    urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon = futures[future]
+                    urban_count, rural_count = future.result()
+                    
+                    print(f"Loaded {urban_count} records for {urban_name}")
+                    print(f"Loaded {rural_count} records for {rural_name}")
+                    
+                    total_records += urban_count + rural_count
             
             # Refresh materialized views
             print("Refreshing materialized views...")
@@ -66,10 +110,12 @@ class InitialLoad:
         except Exception as e:
             print(f"Error during initial data load: {e}")
         finally:
-            conn.close()
-            print("Database connection closed")
+            self.load_data.return_connection_to_pool(conn)
+            print("Database connection returned to the pool")
 
 if __name__ == "__main__":
+    # Show the extract and load modules' log messages
+    setup_logging()
     print("Starting initial historical data load...")
     initial_load = InitialLoad()
     initial_load.load_historical_data() 
\ No newline at end of file
@@ -1,9 +1,78 @@
 import psycopg2
 from psycopg2.extras import execute_values
-from config import get_db_config
-from utils import create_partition_if_needed
-from psycopg2 import pool
+from config import get_db_config, DataConfig
+from utils import create_partitions_if_needed
+from psycopg2 import pool, errors, sql
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import io
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Materialized views mapped to the materialized views they are built from
+REFRESH_DAG = {
+    "urban_rural_hourly": [],
+    "urban_rural_daily": ["urban_rural_hourly"],
+    "normalized_differential_daily": ["urban_rural_hourly"],
+}
+
+# Materialized view names, looked up once per process. Views only change
+# when the schema is redeployed by setup_db
+_MATVIEW_CACHE = None
+
+
+def refresh_levels(views):
+    """
+    Group materialized views into levels that can be refreshed in parallel
+    
+    Each level only depends on views of earlier levels. Views missing from
+    REFRESH_DAG are put in a last level of their own.
+    
+    Args:
+        views (list): Names of existing materialized views
+        
+    Returns:
+        list: Lists of view names, in refresh order
+    """
+    pending = [view for view in views if view in REFRESH_DAG]
+    done = set()
+    levels = []
+    
+    while pending:
+        level = [
+            view for view in pending
+            if all(dep in done or dep not in views for dep in REFRESH_DAG[view])
+        ]
+        if not level:
+            raise ValueError(f"Circular dependency between materialized views {pending}")
+        
+        levels.append(level)
+        done.update(level)
+        pending = [view for view in pending if view not in done]
+    
+    unknown = [view for view in views if view not in REFRESH_DAG]
+    if unknown:
+        levels.append(unknown)
+    
+    return levels
+
+
+def downcast_temperature(temp_df):
+    """
+    Downcast the temperature column to the smallest float dtype (float32)
+    
+    Open-Meteo reports temperatures to 0.1 °C, well within float32 precision.
+    
+    Args:
+        temp_df (pandas.DataFrame): DataFrame with a temperature column
+        
+    Returns:
+        pandas.DataFrame: Copy of temp_df with a downcast temperature column
+    """
+    import pandas as pd  # Only needed once there is data to load
+    return temp_df.assign(temperature=pd.to_numeric(temp_df['temperature'], downcast='float'))
 
 
 class LoadData:
@@ -14,7 +83,7 @@ class LoadData:
         self.connection_pool = None
         self.pool_lock = threading.Lock()  # Thread safety for pool creation
 
-    def init_connection_pool(self, env=None, min_connections=1, max_connections=10):
+    def init_connection_pool(self, env=None, min_connections=4, max_connections=16):
         """
         Initialize a connection pool for database operations
         
@@ -26,11 +95,14 @@ class LoadData:
         Returns:
             ThreadedConnectionPool: Database connection pool
         """
+        # Double-checked so callers do not take the lock once the pool exists
+        if self.connection_pool is not None:
+            return self.connection_pool
         
         with self.pool_lock:
             if self.connection_pool is None:
                 db_params = get_db_config(env)
-                print(f"Initializing connection pool for {db_params['host']}:{db_params['port']}")
+                logger.info("Initializing connection pool for %s:%s", db_params['host'], db_params['port'])
                 
                 self.connection_pool = pool.ThreadedConnectionPool(
                     min_connections,
@@ -39,7 +111,17 @@ class LoadData:
                     database=db_params['database'],
                     user=db_params['user'],
                     password=db_params['password'],
-                    port=db_params['port']
+                    port=db_params['port'],
+                    connect_timeout=DataConfig.CONNECT_TIMEOUT,
+                    # Detect connections dropped by idle timeouts on the network path
+                    keepalives=1,
+                    keepalives_idle=30,
+                    keepalives_interval=10,
+                    keepalives_count=5,
+                    options=(
+                        f"-c statement_timeout={DataConfig.STATEMENT_TIMEOUT_MS} "
+                        f"-c idle_in_transaction_session_timeout={DataConfig.IDLE_IN_TRANSACTION_TIMEOUT_MS}"
+                    )
                 )
                 
         return self.connection_pool
@@ -55,10 +137,27 @@ class LoadData:
             connection: Database connection
         """
         
-        if self.connection_pool is None:
-            self.init_connection_pool(env)
+        # Lock-free fast path once the pool is initialized
+        connection_pool = self.connection_pool
+        if connection_pool is None:
+            connection_pool = self.init_connection_pool(env)
             
-        return self.connection_pool.getconn()
+        conn = connection_pool.getconn()
+        
+        # Replace a connection that was closed while idle in the pool, once
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            conn.rollback()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            logger.warning("Discarding dead pooled connection: %s", e)
+            connection_pool.putconn(conn, close=True)
+            conn = connection_pool.getconn()
+        
+        return conn
 
     def return_connection_to_pool(self, conn):
         """
@@ -71,6 +170,27 @@ class LoadData:
         if self.connection_pool is not None and conn is not None:
             self.connection_pool.putconn(conn)
 
+    def available_connections(self, env=None):
+        """
+        Count the connections the pool can still hand out
+        
+        ThreadedConnectionPool.getconn raises PoolError instead of waiting
+        once maxconn connections are checked out, so concurrent workers
+        are sized to this rather than to maxconn.
+        
+        Args:
+            env (str): Environment ('dev', 'test', 'prod')
+            
+        Returns:
+            int: Number of connections not checked out of the pool
+        """
+        connection_pool = self.connection_pool
+        if connection_pool is None:
+            connection_pool = self.init_connection_pool(env)
+        
+        with connection_pool._lock:
+            return connection_pool.maxconn - len(connection_pool._used)
+
     def get_db_connection(self, env=None, **override_params):
         """
         Get PostgreSQL database connection from the pool
@@ -92,7 +212,8 @@ class LoadData:
             # Override with any provided parameters
             config.update({k: v for k, v in override_params.items() if v is not None})
             
-            print(f"Creating direct connection to database {config['database']} on {config['host']}:{config['port']}")
+            logger.info("Creating direct connection to database %s on %s:%s",
+                        config['database'], config['host'], config['port'])
             
             return psycopg2.connect(
                 host=config['host'],
@@ -120,106 +241,257 @@ class LoadData:
         location_ids = {}
         
         try:
-            print(f"Loading {len(location_pairs)} location pairs to database")
+            logger.info("Loading %d location pairs to database", len(location_pairs))
             
-            for pair in location_pairs:
-                urban_name, urban_lat, urban_lon, rural_name, rural_lat, rural_lon = pair
-                
-                # Insert urban location
-                cursor.execute("""
-                INSERT INTO locations (name, latitude, longitude, is_urban, urban_pair_id)
-                VALUES (%s, %s, %s, %s, %s)
+            urban_names, urban_lats, urban_lons, rural_names, rural_lats, rural_lons = (
+                [list(column) for column in zip(*location_pairs)] if location_pairs else [[]] * 6
+            )
+            
+            # Upsert urban locations, then rural locations referencing the
+            # IDs returned for their urban pair, in a single statement
+            cursor.execute("""
+            WITH urban AS (
+                INSERT INTO locations (name, latitude, longitude, is_urban)
+                SELECT name, latitude, longitude, TRUE
+                FROM unnest(%s::text[], %s::numeric[], %s::numeric[])
+                    AS u(name, latitude, longitude)
                 ON CONFLICT (name) DO UPDATE 
                 SET latitude = EXCLUDED.latitude, 
                     longitude = EXCLUDED.longitude
-                RETURNING location_id
-                """, (urban_name, urban_lat, urban_lon, True, None))
-                
-                urban_id = cursor.fetchone()[0]
-                location_ids[urban_name] = urban_id
-                
-                # Insert rural location with reference to urban pair
-                cursor.execute("""
+                RETURNING name, location_id
+            ),
+            rural AS (
                 INSERT INTO locations (name, latitude, longitude, is_urban, urban_pair_id)
-                VALUES (%s, %s, %s, %s, %s)
+                SELECT r.name, r.latitude, r.longitude, FALSE, urban.location_id
+                FROM unnest(%s::text[], %s::numeric[], %s::numeric[], %s::text[])
+                    AS r(name, latitude, longitude, urban_name),
+                    urban
+                WHERE urban.name = r.urban_name
                 ON CONFLICT (name) DO UPDATE 
                 SET latitude = EXCLUDED.latitude, 
                     longitude = EXCLUDED.longitude,
                     urban_pair_id = EXCLUDED.urban_pair_id
-                RETURNING location_id
-                """, (rural_name, rural_lat, rural_lon, False, urban_id))
-                
-                rural_id = cursor.fetchone()[0]
-                location_ids[rural_name] = rural_id
-                
-                print(f"Added/updated locations: {urban_name} (ID: {urban_id}) and {rural_name} (ID: {rural_id})")
+                RETURNING name, location_id
+            )
+            SELECT name, location_id FROM urban
+            UNION ALL
+            SELECT name, location_id FROM rural
+            """, (urban_names, urban_lats, urban_lons,
+                  rural_names, rural_lats, rural_lons, urban_names))
+            location_ids.update(cursor.fetchall())
+            
+            logger.info("Added/updated %d locations", len(location_ids))
             
             conn.commit()
-            print("Successfully loaded all location data")
+            logger.info("Successfully loaded all location data")
             
         except Exception as e:
             conn.rollback()
-            print(f"Error loading locations: {e}")
+            logger.error("Error loading locations: %s", e)
             raise
         finally:
             cursor.close()
         
         return location_ids
 
-    def load_temperature_data(self, conn, location_id, temp_df):
+    def ensure_partitions(self, conn, min_date, max_date):
         """
-        Load temperature data to database
+        Create the temperature_data partitions covering a date range if needed
+
+        Args:
+            conn: Database connection
+            min_date (datetime): Earliest timestamp to be loaded
+            max_date (datetime): Latest timestamp to be loaded
+        """
+        # Every quarter in the range, not only the first and last
+        year, quarter = min_date.year, (min_date.month - 1) // 3 + 1
+        last = (max_date.year, (max_date.month - 1) // 3 + 1)
+        quarter_starts = []
+        
+        while (year, quarter) <= last:
+            quarter_starts.append(datetime(year, quarter * 3 - 2, 1))
+            year, quarter = year + quarter // 4, quarter % 4 + 1
         
+        # All missing partitions in a single round-trip
+        create_partitions_if_needed(conn, quarter_starts)
+
+    def load_temperature_data_bulk(self, conn, rows):
+        """
+        Load temperature data for many locations in a single statement
+
+        Partitions are not created here, call ensure_partitions for the
+        overall date range before loading.
+
         Args:
             conn: Database connection
-            location_id (int): ID of the location
-            temp_df (pandas.DataFrame): DataFrame with temperature data
-            
+            rows (list): (location_id, timestamp, temperature) tuples
+
         Returns:
             int: Number of records inserted
         """
+        if not rows:
+            logger.info("No temperature records to load")
+            return 0
+
         cursor = conn.cursor()
-        
+
         try:
-            print(f"Loading {len(temp_df)} temperature records for location ID {location_id}")
-            
-            # Check if we need to create new partitions
-            if not temp_df.empty:
-                min_date = temp_df['timestamp'].min()
-                max_date = temp_df['timestamp'].max()
-                create_partition_if_needed(conn, min_date)
-                create_partition_if_needed(conn, max_date)
-            
-            # Prepare data for insertion
-            records = [
-                (location_id, row.timestamp, row.temperature)
-                for row in temp_df.itertuples()
-            ]
-            
-            # Batch insert
-            if records:
-                execute_values(cursor, """
-                INSERT INTO temperature_data 
-                    (location_id, timestamp, temperature)
-                VALUES %s
-                ON CONFLICT (location_id, timestamp) DO UPDATE 
-                SET temperature = EXCLUDED.temperature
-                """, records)
-                
-                conn.commit()
-                print(f"Successfully loaded {len(records)} temperature records")
-                return len(records)
-            else:
-                print("No temperature records to load")
-                return 0
-                
+            logger.info("Loading %d temperature records in bulk", len(rows))
+
+            execute_values(cursor, """
+            INSERT INTO temperature_data
+                (location_id, timestamp, temperature)
+            VALUES %s
+            ON CONFLICT (location_id, timestamp) DO UPDATE
+            SET temperature = EXCLUDED.temperature
+            """, rows, template="(%s, %s, %s)", page_size=DataConfig.BULK_PAGE_SIZE)
+
+            conn.commit()
+            logger.info("Successfully loaded %d temperature records", len(rows))
+            return len(rows)
+
+        except Exception as e:
+            conn.rollback()
+            logger.error("Error loading temperature data: %s", e)
+            raise
+        finally:
+            cursor.close()
+
+    def load_temperature_frame(self, conn, temp_df):
+        """
+        Load a DataFrame of temperature data for many locations using COPY
+
+        The CSV payload is written by pandas straight from the DataFrame
+        columns, without building a Python tuple per row. Small frames are
+        passed to load_temperature_data_bulk.
+
+        Args:
+            conn: Database connection
+            temp_df (pandas.DataFrame): DataFrame with location_id, timestamp
+                                        and temperature columns
+
+        Returns:
+            int: Number of records inserted
+        """
+        if temp_df is None or temp_df.empty:
+            logger.info("No temperature records to load")
+            return 0
+
+        temp_df = downcast_temperature(temp_df)
+
+        if len(temp_df) < DataConfig.COPY_MIN_ROWS:
+            rows = list(zip(
+                temp_df['location_id'].tolist(),
+                temp_df['timestamp'].tolist(),
+                temp_df['temperature'].tolist()
+            ))
+            return self.load_temperature_data_bulk(conn, rows)
+
+        buf = io.StringIO()
+        temp_df.to_csv(buf, columns=['location_id', 'timestamp', 'temperature'], header=False, index=False)
+        buf.seek(0)
+
+        return self.copy_temperature_data(conn, buf, len(temp_df))
+
+    def copy_temperature_data(self, conn, buf, count):
+        """
+        Upsert CSV temperature data through a temporary staging table
+
+        Args:
+            conn: Database connection
+            buf (file-like): CSV rows of location_id, timestamp, temperature
+            count (int): Number of rows in buf
+
+        Returns:
+            int: Number of records inserted
+        """
+        cursor = conn.cursor()
+
+        try:
+            logger.info("Copying %d temperature records", count)
+
+            cursor.execute("""
+            CREATE TEMP TABLE temperature_data_staging (
+                location_id INTEGER,
+                timestamp TIMESTAMP,
+                temperature REAL
+            ) ON COMMIT DROP
+            """)
+            cursor.copy_expert("""
+            COPY temperature_data_staging (location_id, timestamp, temperature)
+            FROM STDIN WITH (FORMAT CSV)
+            """, buf)
+            cursor.execute("""
+            INSERT INTO temperature_data
+                (location_id, timestamp, temperature)
+            SELECT location_id, timestamp, temperature
+            FROM temperature_data_staging
+            ON CONFLICT (location_id, timestamp) DO UPDATE
+            SET temperature = EXCLUDED.temperature
+            """)
+
+            conn.commit()
+            logger.info("Successfully loaded %d temperature records", count)
+            return count
+
         except Exception as e:
             conn.rollback()
-            print(f"Error loading temperature data: {e}")
+            logger.error("Error copying temperature data: %s", e)
             raise
         finally:
             cursor.close()
 
+    def get_materialized_views(self, cursor):
+        """
+        Get the names of all materialized views in the public schema
+        
+        The catalog is queried until it returns views, then cached for the
+        rest of this process. An empty result is not cached, so views
+        created after setup are still found.
+        
+        Args:
+            cursor: Database cursor
+            
+        Returns:
+            list: Materialized view names
+        """
+        global _MATVIEW_CACHE
+        if _MATVIEW_CACHE:
+            return list(_MATVIEW_CACHE)
+        
+        cursor.execute("""
+        SELECT matviewname 
+        FROM pg_catalog.pg_matviews
+        WHERE schemaname = 'public'
+        """)
+        views = [row[0] for row in cursor.fetchall()]
+        if views:
+            _MATVIEW_CACHE = views
+        
+        return list(views)
+
+    def refresh_view(self, cursor, view):
+        """
+        Refresh a single materialized view without blocking readers
+        
+        Falls back to a plain refresh when the view cannot be refreshed
+        concurrently, i.e. it has no unique index or is not populated yet.
+        
+        Args:
+            cursor: Database cursor
+            view (str): Materialized view name
+        """
+        # Quoted as an identifier, names come from the catalog as they are
+        name = sql.Identifier(view)
+        cursor.execute("SAVEPOINT refresh_view")
+        try:
+            cursor.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {}").format(name))
+        except (errors.FeatureNotSupported, errors.ObjectNotInPrerequisiteState) as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT refresh_view")
+            logger.warning("Cannot refresh %s concurrently (%s), using a plain refresh", view, e.pgcode)
+            cursor.execute(sql.SQL("REFRESH MATERIALIZED VIEW {}").format(name))
+        cursor.execute("RELEASE SAVEPOINT refresh_view")
+
     def refresh_materialized_views(self, conn):
         """
         Refresh all materialized views
@@ -230,56 +502,91 @@ class LoadData:
         cursor = conn.cursor()
         
         try:
-            # Get all existing materialized views from database
-            cursor.execute("""
-            SELECT matviewname 
-            FROM pg_catalog.pg_matviews
-            WHERE schemaname = 'public'
-            """)
+            views = self.get_materialized_views(cursor)
             
-            views = [row[0] for row in cursor.fetchall()]
+            logger.info("Found %d materialized views to refresh", len(views))
             
-            # Fallback to known views if query returns empty
-            if not views:
-                views = [
-                    "urban_rural_hourly",
-                    "urban_rural_daily",
-                    "normalized_differential_daily",
-                    "normalized_differential_hourly",
-                    "normalized_differential",
-                    "time_of_day_pattern"
-                ]
+            for level in refresh_levels(views):
+                for view in level:
+                    logger.info("Refreshing materialized view: %s", view)
+                    self.refresh_view(cursor, view)
+                    logger.info("Refreshed view: %s", view)
             
-            print(f"Found {len(views)} materialized views to refresh")
-            
-            for view in views:
-                print(f"Refreshing materialized view: {view}")
-                
-                # Check if materialized view exists
-                cursor.execute("""
-                SELECT EXISTS (
-                    SELECT FROM pg_catalog.pg_matviews
-                    WHERE matviewname = %s
-                )
-                """, (view,))
-                
-                exists = cursor.fetchone()[0]
-                
-                if exists:
-                    cursor.execute(f"REFRESH MATERIALIZED VIEW {view}")
-                    print(f"Refreshed view: {view}")
-                else:
-                    print(f"View {view} does not exist, skipping refresh")
+            conn.commit()
+            logger.info("Successfully refreshed all existing materialized views")
             
+        except Exception as e:
+            conn.rollback()
+            logger.error("Error refreshing materialized views: %s", e)
+            raise
+        finally:
+            cursor.close()
+
+    def refresh_view_from_pool(self, env, view):
+        """
+        Refresh a single materialized view on its own pooled connection
+        
+        Args:
+            env (str): Environment ('dev', 'test', 'prod')
+            view (str): Materialized view name
+        """
+        conn = self.get_connection_from_pool(env)
+        cursor = conn.cursor()
+        
+        try:
+            logger.info("Refreshing materialized view: %s", view)
+            self.refresh_view(cursor, view)
             conn.commit()
-            print("Successfully refreshed all existing materialized views")
+            logger.info("Refreshed view: %s", view)
             
         except Exception as e:
             conn.rollback()
-            print(f"Error refreshing materialized views: {e}")
+            logger.error("Error refreshing materialized view %s: %s", view, e)
             raise
         finally:
             cursor.close()
+            self.return_connection_to_pool(conn)
+
+    def refresh_materialized_views_parallel(self, env=None, max_workers=4):
+        """
+        Refresh all materialized views, independent views in parallel
+        
+        Views are refreshed level by level following REFRESH_DAG, each view
+        on its own pooled connection.
+        
+        Args:
+            env (str): Environment ('dev', 'test', 'prod')
+            max_workers (int): Maximum number of views refreshed at once
+        """
+        # A connection is only needed for the first lookup of this process
+        if _MATVIEW_CACHE:
+            views = list(_MATVIEW_CACHE)
+        else:
+            conn = self.get_connection_from_pool(env)
+            cursor = conn.cursor()
+            try:
+                views = self.get_materialized_views(cursor)
+                conn.commit()
+            finally:
+                cursor.close()
+                self.return_connection_to_pool(conn)
+        
+        logger.info("Found %d materialized views to refresh", len(views))
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for level in refresh_levels(views):
+                futures = [executor.submit(self.refresh_view_from_pool, env, view) for view in level]
+                
+                # Stop at the first failure, views of later levels depend on this one
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception:
+                        for pending in futures:
+                            pending.cancel()
+                        raise
+        
+        logger.info("Successfully refreshed all existing materialized views")
 
 if __name__ == "__main__":
     # Test database connection
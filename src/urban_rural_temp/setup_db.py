@@ -20,33 +20,27 @@ def setup_database(env=None):
         conn = psycopg2.connect(**db_params)
         cursor = conn.cursor()
         
-        # Execute schema.sql
-        print(f"Executing schema.sql from {SQLConfig.SCHEMA_PATH}")
-        if os.path.exists(SQLConfig.SCHEMA_PATH):
-            with open(SQLConfig.SCHEMA_PATH, "r") as f:
-                schema_sql = f.read()
-                cursor.execute(schema_sql)
-        else:
+        # Collect schema.sql and, if they exist, indexes.sql and views.sql
+        if not os.path.exists(SQLConfig.SCHEMA_PATH):
             print(f"Schema file not found at {SQLConfig.SCHEMA_PATH}")
             raise FileNotFoundError(f"Schema file not found at {SQLConfig.SCHEMA_PATH}")
         
-        # Execute indexes.sql if it exists
-        if os.path.exists(SQLConfig.INDEXES_PATH):
-            print(f"Executing indexes.sql from {SQLConfig.INDEXES_PATH}")
-            with open(SQLConfig.INDEXES_PATH, "r") as f:
-                indexes_sql = f.read()
-                cursor.execute(indexes_sql)
-        else:
-            print(f"Indexes file not found at {SQLConfig.INDEXES_PATH}")
+        sql_files = [SQLConfig.SCHEMA_PATH]
+        for path in (SQLConfig.INDEXES_PATH, SQLConfig.VIEWS_PATH):
+            if os.path.exists(path):
+                sql_files.append(path)
+            else:
+                print(f"{os.path.basename(path)} file not found at {path}")
         
-        # Execute views.sql if it exists
-        if os.path.exists(SQLConfig.VIEWS_PATH):
-            print(f"Executing views.sql from {SQLConfig.VIEWS_PATH}")
-            with open(SQLConfig.VIEWS_PATH, "r") as f:
-                views_sql = f.read()
-                cursor.execute(views_sql)
-        else:
-            print(f"Views file not found at {SQLConfig.VIEWS_PATH}")
+        sql_scripts = []
+        for path in sql_files:
+            print(f"Reading {os.path.basename(path)} from {path}")
+            with open(path, "r") as f:
+                sql_scripts.append(f.read())
+        
+        # Execute all files in a single round-trip, in order
+        print(f"Executing {len(sql_scripts)} SQL files")
+        cursor.execute("\n;\n".join(sql_scripts))
         
         # Commit the changes
         conn.commit()
@@ -2,6 +2,140 @@
 Utility function(s), may be expanded later 
 """
 
+import functools
+import logging
+from datetime import datetime
+from psycopg2 import errors, sql
+
+logger = logging.getLogger(__name__)
+
+# Partitions created or confirmed by this process, as (dsn, year, quarter).
+# Keyed by DSN so that pooled connections to the same database share entries
+_known_partitions = set()
+
+# Month-day bounds of each quarter, the end of Q4 falls in the next year
+_QUARTER_BOUNDS = {
+    1: ("01-01", "04-01"),
+    2: ("04-01", "07-01"),
+    3: ("07-01", "10-01"),
+    4: ("10-01", "01-01"),
+}
+
+@functools.lru_cache(maxsize=None)
+def _bounds(year, quarter):
+    """Start date, end date and partition name of a quarter"""
+    start, end = _QUARTER_BOUNDS[quarter]
+    end_year = year + quarter // 4  # Only Q4 ends in the next year
+    return f"{year}-{start}", f"{end_year}-{end}", f"temperature_data_{year}_q{quarter}"
+
+def partition_statement(year, quarter):
+    """
+    Build the DDL creating the temperature_data partition of a quarter
+    
+    Args:
+        year (int): Year of the partition
+        quarter (int): Quarter of the partition, 1 to 4
+        
+    Returns:
+        tuple: Partition name and the composed SQL statement
+    """
+    start_date, end_date, partition_name = _bounds(year, quarter)
+    
+    # Identifier and bounds are quoted by psycopg2, not formatted into the text
+    statement = sql.SQL("""
+        CREATE TABLE IF NOT EXISTS {partition} PARTITION OF temperature_data
+        FOR VALUES FROM ({start_date}) TO ({end_date});
+        """).format(
+        partition=sql.Identifier(partition_name),
+        start_date=sql.Literal(start_date),
+        end_date=sql.Literal(end_date)
+    )
+    return partition_name, statement
+
+def existing_partitions(cursor, parent="temperature_data"):
+    """
+    Get the names of all partitions of a table in a single catalog query
+    
+    Reads the parent's children from pg_inherits, which lists exactly its
+    partitions, instead of matching table names in the pg_tables view.
+    
+    Args:
+        cursor: Database cursor
+        parent (str): Name of the partitioned table
+        
+    Returns:
+        set: Partition names
+    """
+    cursor.execute("""
+    SELECT c.relname
+    FROM pg_catalog.pg_inherits i
+    JOIN pg_catalog.pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = %s::regclass
+    """, (parent,))
+    
+    return {row[0] for row in cursor.fetchall()}
+
+def create_partitions_if_needed(conn, timestamps):
+    """
+    Create the temperature_data partitions for several timestamps if needed
+    
+    Partitions already known to exist are skipped without a query. For the
+    others, existing partitions are looked up in one catalog query and all
+    missing quarters are created with a single multi-statement execute.
+    
+    Args:
+        conn: Database connection
+        timestamps (iterable): Timestamps (datetime) to check
+    """
+    # Determine which quarters the timestamps fall into
+    quarters = {(timestamp.year, (timestamp.month - 1) // 3 + 1) for timestamp in timestamps}
+    keys = sorted(
+        key for key in ((conn.dsn, year, quarter) for year, quarter in quarters)
+        if key not in _known_partitions
+    )
+    if not keys:
+        return
+    
+    # A partition created concurrently is retried once, a second collision is a real error
+    for attempt in range(2):
+        cursor = conn.cursor()
+        
+        try:
+            # Only create the partitions that are not in the catalog yet
+            existing = existing_partitions(cursor)
+            partition_names = []
+            statements = []
+            for _, year, quarter in keys:
+                partition_name, statement = partition_statement(year, quarter)
+                if partition_name not in existing:
+                    partition_names.append(partition_name)
+                    statements.append(statement)
+            
+            if statements:
+                # IF NOT EXISTS still guards against partitions created meanwhile
+                logger.info("Creating partitions %s", ", ".join(partition_names))
+                cursor.execute(sql.Composed(statements))
+            
+            conn.commit()
+            _known_partitions.update(keys)
+            return
+        
+        except (errors.DuplicateTable, errors.UniqueViolation) as e:
+            # Another process created a partition between the lookup and the DDL,
+            # which IF NOT EXISTS does not fully cover. The batch was aborted,
+            # the retry finds that partition in the catalog and creates the rest
+            conn.rollback()
+            if attempt:
+                logger.error("Error creating partition after retry: %s", e)
+                raise
+            logger.debug("Partition created concurrently, retrying: %s", e)
+        except Exception as e:
+            conn.rollback()
+            logger.error("Error creating partition: %s", e)
+            raise
+        finally:
+            cursor.close()
+
 def create_partition_if_needed(conn, timestamp):
     """
     Create a new partition for the temperature_data table if needed
@@ -10,46 +144,24 @@ def create_partition_if_needed(conn, timestamp):
         conn: Database connection
         timestamp (datetime): Timestamp to check
     """
-    # Determine which quarter the timestamp falls into
-    year = timestamp.year
-    quarter = (timestamp.month - 1) // 3 + 1
-    
-    # Calculate the start and end dates for the quarter
-    start_month = (quarter - 1) * 3 + 1
-    start_date = f"{year}-{start_month:02d}-01"
+    create_partitions_if_needed(conn, (timestamp,))
+
+def prewarm_partitions(conn, now=None):
+    """
+    Create the partitions of the current and the next quarter ahead of time
     
-    if quarter == 4:
-        end_date = f"{year + 1}-01-01"
-    else:
-        end_date = f"{year}-{(quarter * 3 + 1):02d}-01"
+    Called when a pipeline starts, so that loads around a quarter rollover
+    do not wait for partition DDL.
     
-    partition_name = f"temperature_data_{year}_q{quarter}"
+    Args:
+        conn: Database connection
+        now (datetime, optional): Reference time, defaults to the current time
+    """
+    if now is None:
+        now = datetime.now()
     
-    cursor = conn.cursor()
+    # First day of the next quarter, a fixed number of days could skip over it
+    start_month = (now.month - 1) // 3 * 3 + 1
+    next_quarter = datetime(now.year + (start_month == 10), (start_month + 2) % 12 + 1, 1)
     
-    try:
-        # Check if partition exists
-        # query database metadata
-        cursor.execute("""
-        SELECT COUNT(*) FROM pg_tables 
-        WHERE tablename = %s AND schemaname = 'public'
-        """, (partition_name.lower(),))
-        
-        result = cursor.fetchone()
-        exists = result[0] > 0 if result else False
-        
-        if not exists:
-            # Create the partition if it doesn't exist
-            print(f"Creating new partition {partition_name}")
-            cursor.execute(f"""
-            CREATE TABLE {partition_name} PARTITION OF temperature_data
-            FOR VALUES FROM ('{start_date}') TO ('{end_date}')
-            """)
-            conn.commit()
-            
-    except Exception as e:
-        conn.rollback()
-        print(f"Error creating partition: {e}")
-        raise
-    finally:
-        cursor.close()
\ No newline at end of file
+    create_partitions_if_needed(conn, (now, next_quarter))